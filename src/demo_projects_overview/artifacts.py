@@ -0,0 +1,212 @@
+"""The `artifacts.py` module publishes and resolves versioned model artifacts.
+
+A published version is an immutable directory `artifacts/<version>/` holding the embeddings and the project corpus
+files. The `artifacts/CURRENT` file names the version in use and is only ever replaced atomically, so readers see
+either the old or the new version and never a half-written one. Single-project changes are logged to
+`artifacts/index-log.jsonl`, outside of the versions, and replayed on top of whichever version is loaded.
+"""
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+EMBEDDINGS_FILE = "fasttext-embeddings.bin"
+LABELLED_TEXT_FILE = "labelled-text.json"
+METADATA_FILE = "metadata.json"
+PROJECT_NAMES_FILE = "project_names.txt"
+COMPRESSION_FILE = "compression.npz"
+CURRENT_FILE = "CURRENT"
+INDEX_LOG_FILE = "index-log.jsonl"
+LEGACY_VERSION = "legacy"
+
+
+class ArtifactPaths(NamedTuple):
+    """Paths to the files making up one version of the model artifacts."""
+
+    version: str
+    directory: Path
+    embeddings: Path
+    labelled_text: Path
+    metadata: Path
+    project_names: Path
+    compression: Path
+
+
+def default_root() -> Path:
+    """Get the default directory in which artifact versions are published."""
+    return Path(__file__).parent / "artifacts"
+
+
+def index_log_path(root: Optional[Path] = None) -> Path:
+    """Get the path of the log of single-project changes shared by all versions.
+
+    :param root: the artifacts directory, defaults to `default_root()`
+    :return: the path of the log
+    """
+    root = default_root() if root is None else Path(root)
+    return root / INDEX_LOG_FILE
+
+
+def get_current_version(root: Optional[Path] = None) -> str:
+    """Get the version named by the `CURRENT` pointer.
+
+    :param root: the artifacts directory, defaults to `default_root()`
+    :return: the current version, or `LEGACY_VERSION` if nothing was published yet
+    """
+    root = default_root() if root is None else Path(root)
+    try:
+        with open(root / CURRENT_FILE, "r") as file:
+            version = file.read().strip()
+    except FileNotFoundError:
+        return LEGACY_VERSION
+    return version or LEGACY_VERSION
+
+
+def resolve_paths(version: str, root: Optional[Path] = None) -> ArtifactPaths:
+    """Get the artifact paths of a version.
+
+    The `LEGACY_VERSION` resolves to the unversioned `corpus/` and `embeddings/` files written by `train.py`.
+
+    :param version: the version to resolve
+    :param root: the artifacts directory, defaults to `default_root()`
+    :return: the paths of the version's files
+    """
+    if version == LEGACY_VERSION:
+        package_dir = Path(__file__).parent
+        corpus_dir = package_dir / "corpus"
+        return ArtifactPaths(
+            version=version,
+            directory=corpus_dir,
+            embeddings=package_dir / "embeddings" / EMBEDDINGS_FILE,
+            labelled_text=corpus_dir / LABELLED_TEXT_FILE,
+            metadata=corpus_dir / METADATA_FILE,
+            project_names=corpus_dir / PROJECT_NAMES_FILE,
+            compression=package_dir / "embeddings" / COMPRESSION_FILE,
+        )
+
+    root = default_root() if root is None else Path(root)
+    directory = root / version
+    return ArtifactPaths(
+        version=version,
+        directory=directory,
+        embeddings=directory / EMBEDDINGS_FILE,
+        labelled_text=directory / LABELLED_TEXT_FILE,
+        metadata=directory / METADATA_FILE,
+        project_names=directory / PROJECT_NAMES_FILE,
+        compression=directory / COMPRESSION_FILE,
+    )
+
+
+def publish(
+    embeddings_path: str,
+    labelled_text_path: str,
+    metadata_path: str,
+    project_names_path: str,
+    compression_path: Optional[str] = None,
+    root: Optional[Path] = None,
+    keep: int = 3,
+) -> str:
+    """Publish a new version of the artifacts.
+
+    The files are copied into a staging directory which is renamed into place once complete. Only then is the
+    `CURRENT` pointer switched to the new version. Files of already published versions never change, so they are
+    hard-linked instead of copied where possible, and the new version shares them with the old one.
+
+    :param embeddings_path: path to the trained fasttext model
+    :param labelled_text_path: path to the `labelled-text.json` file
+    :param metadata_path: path to the `metadata.json` file
+    :param project_names_path: path to the `project_names.txt` file
+    :param compression_path: path to the fitted `compression.npz` file, `None` stores the vectors as float32
+    :param root: the artifacts directory, defaults to `default_root()`
+    :param keep: the number of most recent versions to keep on disk
+    :return: the published version
+    """
+    root = default_root() if root is None else Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    version = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1e6) % 1000000:06d}"
+
+    staging_dir = root / f".staging-{version}"
+    staging_dir.mkdir()
+    _copy_or_link(embeddings_path, staging_dir / EMBEDDINGS_FILE, root)
+    _copy_or_link(labelled_text_path, staging_dir / LABELLED_TEXT_FILE, root)
+    _copy_or_link(metadata_path, staging_dir / METADATA_FILE, root)
+    _copy_or_link(project_names_path, staging_dir / PROJECT_NAMES_FILE, root)
+    if compression_path is not None:
+        _copy_or_link(compression_path, staging_dir / COMPRESSION_FILE, root)
+    os.rename(staging_dir, root / version)
+
+    set_current_version(version, root)
+    prune_versions(root, keep)
+    return version
+
+
+def same_file(path: Path, other: Path) -> bool:
+    """Check if two paths are the same file, e.g. files shared by two versions, or are both missing.
+
+    :param path: a path
+    :param other: another path
+    :return: `True` if both paths name the same file or neither exists
+    """
+    if not os.path.exists(path) and not os.path.exists(other):
+        return True
+    try:
+        return os.path.samefile(path, other)
+    except FileNotFoundError:
+        return False
+
+
+def _copy_or_link(source: str, destination: Path, root: Path) -> None:
+    """Hard-link a file of a published version, copy any other file, which may still be overwritten in place."""
+    if Path(source).resolve().parent.parent == root.resolve():
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass  # e.g. a file system without hard links
+    shutil.copyfile(source, destination)
+
+
+def set_current_version(version: str, root: Optional[Path] = None) -> None:
+    """Atomically point `CURRENT` to a version.
+
+    :param version: an already published version
+    :param root: the artifacts directory, defaults to `default_root()`
+    """
+    root = default_root() if root is None else Path(root)
+    tmp_path = root / f".{CURRENT_FILE}-{os.getpid()}"
+    with open(tmp_path, "w") as file:
+        file.write(version + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, root / CURRENT_FILE)
+
+
+def list_versions(root: Optional[Path] = None) -> List[str]:
+    """List the published versions from the oldest to the newest.
+
+    :param root: the artifacts directory, defaults to `default_root()`
+    :return: a list of versions
+    """
+    root = default_root() if root is None else Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(path.name for path in root.iterdir() if path.is_dir() and not path.name.startswith("."))
+
+
+def prune_versions(root: Optional[Path] = None, keep: int = 3) -> None:
+    """Delete old versions, never the current one.
+
+    Running processes hold the artifacts of their version in memory, so removing the files does not affect them.
+    Index compactions always start from the current version, which is kept.
+
+    :param root: the artifacts directory, defaults to `default_root()`
+    :param keep: the number of most recent versions to keep on disk
+    """
+    root = default_root() if root is None else Path(root)
+    current = get_current_version(root)
+    versions = list_versions(root)
+    for version in versions[: max(len(versions) - keep, 0)]:
+        if version != current:
+            shutil.rmtree(root / version, ignore_errors=True)
@@ -0,0 +1,267 @@
+"""The `benchmark.py` module measures how `Model` scales with the catalog size and the number of concurrent users.
+
+Synthetic catalogs are written in the `labelled-text.json`, `metadata.json` and `project_names.txt` format next to
+the current embeddings, so the numbers come from the same code path as the app.
+"""
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import artifacts
+import numpy as np
+from compression import DEFAULT_QUERIES
+from model import Model
+
+_worker_model: Optional[Model] = None
+
+
+def generate_catalog(
+    output_dir: str,
+    num_projects: int,
+    vocabulary: List[str],
+    header: List[str],
+    sentences_per_project: int = 8,
+    words_per_sentence: int = 15,
+    seed: int = 0,
+) -> None:
+    """Write a synthetic catalog of projects.
+
+    :param output_dir: the directory the `labelled-text.json`, `metadata.json` and `project_names.txt` files go to
+    :param num_projects: the number of projects
+    :param vocabulary: the words the sentences are sampled from
+    :param header: the header of the metadata
+    :param sentences_per_project: the average number of sentences per project
+    :param words_per_sentence: the number of words per sentence
+    :param seed: the seed of the sampling
+    """
+    rng = random.Random(seed)
+    labelled_text = {}
+    metadata: Dict[str, List[str]] = {"header": header}
+    for i in range(num_projects):
+        name = f"Synthetic project {i}"
+        num_sentences = rng.randint(max(sentences_per_project // 2, 1), sentences_per_project * 3 // 2 + 1)
+        labelled_text[name] = [
+            " ".join(rng.choice(vocabulary) for _ in range(words_per_sentence)) for _ in range(num_sentences)
+        ]
+        metadata[name] = [" ".join(rng.choice(vocabulary) for _ in range(5)) for _ in header]
+
+    output_path = Path(output_dir)
+    with open(output_path / artifacts.LABELLED_TEXT_FILE, "w") as json_file:
+        json.dump(labelled_text, json_file)
+    with open(output_path / artifacts.METADATA_FILE, "w") as json_file:
+        json.dump(metadata, json_file)
+    with open(output_path / artifacts.PROJECT_NAMES_FILE, "w") as file:
+        for name in labelled_text:
+            file.write(name + "\n")
+
+
+def make_synthetic_artifacts(root: str, num_projects: int, source_version: Optional[str] = None, seed: int = 0) -> str:
+    """Publish a synthetic catalog together with the embeddings of an existing version.
+
+    The embeddings are symlinked, not copied. The vocabulary and the metadata header come from the source catalog.
+
+    :param root: the artifacts directory of the synthetic catalog
+    :param num_projects: the number of projects
+    :param source_version: the version providing the embeddings, defaults to the current one
+    :param seed: the seed of the sampling
+    :return: the version of the synthetic catalog
+    """
+    source = artifacts.resolve_paths(source_version or artifacts.get_current_version())
+    with open(source.labelled_text, "r") as file:
+        labelled_text = json.load(file)
+    with open(source.metadata, "r") as file:
+        header = json.load(file).get("header", ["Description"])
+    vocabulary = sorted({word for sentences in labelled_text.values() for s in sentences for word in s.split()})
+
+    version = f"synthetic-{num_projects}"
+    directory = Path(root) / version
+    directory.mkdir(parents=True, exist_ok=True)
+    generate_catalog(str(directory), num_projects, vocabulary, header, seed=seed)
+    os.symlink(source.embeddings.resolve(), directory / artifacts.EMBEDDINGS_FILE)
+    if source.compression.exists():
+        shutil.copyfile(source.compression, directory / artifacts.COMPRESSION_FILE)
+    artifacts.set_current_version(version, Path(root))
+    return version
+
+
+def get_rss_mb(pid: Optional[int] = None) -> float:
+    """Get the resident memory of a process in MB.
+
+    :param pid: the process, defaults to this one
+    :return: the current resident memory, or the peak one of this process where `/proc` is unavailable
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (FileNotFoundError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3 if pid is None else 0.0
+
+
+def get_children_pids() -> List[int]:
+    """Get the processes started by this one, empty where `/proc` is unavailable."""
+    pids = []
+    for path in glob.glob("/proc/[0-9]*/stat"):
+        try:
+            with open(path, "r") as file:
+                # the fields after the command name, which may contain spaces, start with the state and the parent
+                parent = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+            continue  # the process exited meanwhile
+        if parent == os.getpid():
+            pids.append(int(Path(path).parent.name))
+    return pids
+
+
+def _init_worker(artifacts_root: str) -> None:
+    """Load the model once per worker process."""
+    global _worker_model
+    _worker_model = Model(artifacts_root=artifacts_root, watch_interval=None)
+
+
+def _timed_query(model: Optional[Model], query: str, num_outputs: int) -> float:
+    """Run one query and return its latency in seconds."""
+    model = _worker_model if model is None else model
+    start = time.perf_counter()
+    model.get_best_project_scores(query, num_outputs)  # type: ignore
+    return time.perf_counter() - start
+
+
+def run_load(
+    executor: Executor, model: Optional[Model], queries: List[str], num_requests: int, num_outputs: int = 3
+) -> Dict[str, float]:
+    """Send queries concurrently and summarize the latencies.
+
+    :param executor: the pool running the queries
+    :param model: the model queried by threads, `None` for workers holding their own model
+    :param queries: the queries sent round-robin
+    :param num_requests: the number of queries sent
+    :param num_outputs: the number of projects requested per query
+    :return: a dict with the throughput and the latency percentiles in milliseconds
+    """
+    start = time.perf_counter()
+    futures = [
+        executor.submit(_timed_query, model, queries[i % len(queries)], num_outputs) for i in range(num_requests)
+    ]
+    latencies = np.array([future.result() for future in futures]) * 1000
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput_qps": num_requests / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "latency_max_ms": float(latencies.max()),
+    }
+
+
+def run_catalog(
+    num_projects: int, concurrencies: List[int], num_requests: int, use_processes: bool, queries: List[str]
+) -> List[Dict[str, Any]]:
+    """Measure one catalog size for every concurrency, meant to run in a fresh process.
+
+    :param num_projects: the number of synthetic projects
+    :param concurrencies: the numbers of concurrent users
+    :param num_requests: the number of queries per measurement
+    :param use_processes: if the users are processes with their own model instead of threads sharing one
+    :param queries: the queries sent
+    :return: a list with one row of results per concurrency
+    """
+    results = []
+    root = tempfile.mkdtemp(prefix="benchmark-artifacts-")
+    try:
+        make_synthetic_artifacts(root, num_projects)
+        rss_before = get_rss_mb()
+        start = time.perf_counter()
+        model = Model(artifacts_root=root, watch_interval=None)
+        load_seconds = time.perf_counter() - start
+        model.index.build()
+        row_base = {
+            "num_projects": num_projects,
+            "num_sentences": sum(len(sentences) for sentences in model.index.labelled_text.values()),
+            "load_seconds": load_seconds,
+            "index_mb": model.index.nbytes / 1e6,
+            "model_rss_mb": get_rss_mb() - rss_before,
+        }
+
+        for concurrency in concurrencies:
+            if use_processes is True:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(concurrency, context, initializer=_init_worker, initargs=(root,)) as pool:
+                    run_load(pool, None, queries, 2 * concurrency)  # load the models before timing
+                    stats = run_load(pool, None, queries, num_requests)
+                    workers_rss_mb = sum(get_rss_mb(pid) for pid in get_children_pids())
+            else:
+                with ThreadPoolExecutor(concurrency) as pool:
+                    stats = run_load(pool, model, queries, num_requests)
+                workers_rss_mb = 0.0
+            row = {**row_base, "concurrency": concurrency, **stats, "rss_mb": get_rss_mb() + workers_rss_mb}
+            print(row)
+            results.append(row)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def run_benchmark(
+    catalog_sizes: List[int],
+    concurrencies: List[int],
+    num_requests: int = 200,
+    use_processes: bool = False,
+    queries: Optional[List[str]] = None,
+    output_path: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Measure the latency, throughput and memory for every catalog size and concurrency.
+
+    Every catalog size is measured in a freshly started process, so `model_rss_mb` is the memory the model added to
+    an otherwise idle interpreter. `rss_mb` is the memory of that process and of its worker processes.
+
+    :param catalog_sizes: the numbers of synthetic projects
+    :param concurrencies: the numbers of concurrent users
+    :param num_requests: the number of queries per measurement
+    :param use_processes: if the users are processes with their own model instead of threads sharing one
+    :param queries: the queries sent, defaults to `DEFAULT_QUERIES`
+    :param output_path: if set, the results are also written to this csv file
+    :return: a list with one row of results per catalog size and concurrency
+    """
+    queries = DEFAULT_QUERIES if queries is None else queries
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for num_projects in catalog_sizes:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            results.extend(
+                pool.submit(run_catalog, num_projects, concurrencies, num_requests, use_processes, queries).result()
+            )
+
+    if output_path is not None and len(results) > 0:
+        with open(output_path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[17, 170, 1700])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--processes", action="store_true", help="use worker processes instead of threads")
+    parser.add_argument("--output", default="benchmark-results.csv")
+    args = parser.parse_args()
+    run_benchmark(
+        catalog_sizes=args.catalog_sizes,
+        concurrencies=args.concurrency,
+        num_requests=args.requests,
+        use_processes=args.processes,
+        output_path=args.output,
+    )
@@ -0,0 +1,192 @@
+"""The `bulk_scoring.py` module scores large csv or jsonl files of queries offline.
+
+The input is streamed in chunks which are scored in a process pool. The index is loaded once in the parent process
+and shared with forked workers, so memory stays bounded by the number of chunks in flight. Results are appended to a
+jsonl output, one line per input row, and an interrupted job resumes after the last complete line.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from model import Model
+
+_model: Optional[Model] = None
+
+
+def count_done_rows(output_path: str) -> int:
+    """Count the complete lines of an output file, dropping a partially written last line.
+
+    :param output_path: path to the jsonl output
+    :return: the number of input rows already scored
+    """
+    if not os.path.exists(output_path):
+        return 0
+    num_lines = 0
+    complete = 0
+    position = 0
+    with open(output_path, "rb+") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            num_lines += block.count(b"\n")
+            last_newline = block.rfind(b"\n")
+            if last_newline != -1:
+                complete = position + last_newline + 1
+            position += len(block)
+        if complete < position:
+            file.truncate(complete)
+    return num_lines
+
+
+def read_chunks(
+    input_path: str, text_column: str, id_column: Optional[str], chunk_size: int, skip_rows: int = 0
+) -> Iterator[List[Tuple[Any, str]]]:
+    """Stream `(id, query)` pairs from a csv or jsonl file in chunks.
+
+    :param input_path: path to a `.csv` or `.jsonl` file
+    :param text_column: the column (or json key) with the query
+    :param id_column: the column (or json key) with the row id, the row number is used if `None`
+    :param chunk_size: the number of rows per chunk
+    :param skip_rows: the number of rows already scored
+    :return: an iterator over chunks of `(id, query)` pairs
+    """
+    if input_path.endswith(".csv"):
+        # a callable instead of a range, which pandas would turn into a set of every skipped row, and blank lines
+        # kept as empty queries, so that every row is one line of the output
+        reader = pd.read_csv(
+            input_path,
+            chunksize=chunk_size,
+            skiprows=lambda i: 0 < i <= skip_rows,
+            skip_blank_lines=False,
+            dtype=str,
+        )
+        row_number = skip_rows
+        for df in reader:
+            texts = df[text_column].fillna("").tolist()
+            if id_column is None:
+                ids: List[Any] = list(range(row_number, row_number + len(df)))
+            else:
+                ids = df[id_column].tolist()
+            row_number += len(df)
+            yield list(zip(ids, texts))
+    else:
+        with open(input_path, "r") as file:
+            # skip the scored lines before parsing them
+            lines = islice((line for line in file if line.strip() != ""), skip_rows, None)
+            row_number = skip_rows
+            while True:
+                chunk = [json.loads(line) for line in islice(lines, chunk_size)]
+                if len(chunk) == 0:
+                    return
+                yield [
+                    (row_number + i if id_column is None else record.get(id_column), _to_text(record.get(text_column)))
+                    for i, record in enumerate(chunk)
+                ]
+                row_number += len(chunk)
+
+
+def _to_text(value: Any) -> str:
+    """Convert a json value to a query, e.g. numbers, so that a single odd row cannot stop the job."""
+    return "" if value is None else str(value)
+
+
+def _init_worker(artifacts_root: Optional[str]) -> None:
+    """Load the model in a worker, only needed where workers cannot be forked from the parent."""
+    global _model
+    if _model is None:
+        _model = Model(artifacts_root=artifacts_root, watch_interval=None)
+
+
+def _score_chunk(rows: List[Tuple[Any, str]], num_outputs: int) -> List[str]:
+    """Score a chunk of queries and format the results as json lines."""
+    lines = []
+    for row_id, query in rows:
+        best_project_scores = _model.get_best_project_scores(query, num_outputs)  # type: ignore
+        results = [{"project": name, "score": float(score)} for name, score in best_project_scores]
+        lines.append(json.dumps({"id": row_id, "query": query, "results": results}, allow_nan=False) + "\n")
+    return lines
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    text_column: str = "query",
+    id_column: Optional[str] = None,
+    num_outputs: int = 3,
+    chunk_size: int = 1000,
+    processes: Optional[int] = None,
+    artifacts_root: Optional[str] = None,
+) -> int:
+    """Score every query of a csv or jsonl file and write the top projects to a jsonl file.
+
+    :param input_path: path to a `.csv` or `.jsonl` file
+    :param output_path: path to the jsonl output, an existing output is resumed
+    :param text_column: the column (or json key) with the query
+    :param id_column: the column (or json key) with the row id, the row number is used if `None`
+    :param num_outputs: the number of projects written per query
+    :param chunk_size: the number of rows per chunk sent to a worker
+    :param processes: the number of worker processes, defaults to the number of cores
+    :param artifacts_root: the directory with published artifact versions, defaults to `artifacts.default_root()`
+    :return: the number of rows scored by this run
+    """
+    global _model
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    skip_rows = count_done_rows(output_path)
+    if skip_rows > 0:
+        print(f"Resuming after {skip_rows} scored rows")
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # load once here, forked workers share the index pages copy-on-write
+        _model = Model(artifacts_root=artifacts_root, watch_interval=None)
+        _model.index.build()  # before forking, so that the search matrix is shared too
+        context: multiprocessing.context.BaseContext = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    scored = 0
+    start = time.perf_counter()
+    with context.Pool(processes, initializer=_init_worker, initargs=(artifacts_root,)) as pool:
+        with open(output_path, "a") as output:
+            pending: "deque[Any]" = deque()
+            chunks = read_chunks(input_path, text_column, id_column, chunk_size, skip_rows)
+            while True:
+                for chunk in islice(chunks, 2 * processes - len(pending)):
+                    pending.append(pool.apply_async(_score_chunk, (chunk, num_outputs)))
+                if len(pending) == 0:
+                    break
+
+                lines = pending.popleft().get()
+                output.writelines(lines)
+                output.flush()
+                os.fsync(output.fileno())
+                scored += len(lines)
+                print(f"Scored {skip_rows + scored} rows ({scored / (time.perf_counter() - start):.0f} rows/s)")
+
+    return scored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="a .csv or .jsonl file of queries")
+    parser.add_argument("output", help="the .jsonl file the results are appended to")
+    parser.add_argument("--text-column", default="query")
+    parser.add_argument("--id-column", default=None)
+    parser.add_argument("--num-outputs", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    score_file(
+        input_path=args.input,
+        output_path=args.output,
+        text_column=args.text_column,
+        id_column=args.id_column,
+        num_outputs=args.num_outputs,
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+    )
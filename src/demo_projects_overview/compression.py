@@ -0,0 +1,230 @@
+"""The `compression.py` module stores the project sentence vectors with reduced precision and dimension."""
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import preprocessing
+
+DTYPES = ("float32", "float16", "int8")
+
+# typical queries of the app, used to check the rankings of compressed vectors and by `benchmark.py`
+DEFAULT_QUERIES = [
+    "text mining and nlp with fasttext",
+    "nlp with transformers, huggingface transformers, robbert",
+    "pytorch and computer vision, image processing",
+    "aws app deployment, ec2",
+    "vacancy parsing over languages",
+    "sentiment analysis of human well-being",
+    "climate change, emissions, remote sensing",
+]
+
+
+class VectorCompressor:
+    """Encodes sentence vectors as float32, float16 or int8 codes, optionally after a PCA down-projection.
+
+    The projection keeps the top right singular vectors of the (uncentered) sentence matrix, which preserves dot
+    products and therefore cosine similarities best. Rows are L2-normalized after the projection, so a cosine
+    similarity is a single dot product and no norms need to be stored. The int8 codes use one symmetric scale per
+    dimension. Queries are projected the same way and multiplied by the scales, so scoring never decodes the stored
+    matrix as a whole.
+
+    float16 and int8 codes are converted to float32 block by block into a reused buffer before the dot product. int8
+    keeps the scan as fast as float32, float16 saves memory only and scans slower, since numpy has no fast float16
+    dot product.
+    """
+
+    def __init__(
+        self,
+        dtype: str = "float32",
+        components: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        block_size: int = 4096,
+    ) -> None:
+        """
+        Create a compressor from fitted parameters, the defaults keep the vectors unchanged.
+
+        :param dtype: the storage type, one of `DTYPES`
+        :param components: the PCA components with shape `(pca_dim, dim)`, `None` keeps all dimensions
+        :param scales: the per-dimension scales of the int8 codes
+        :param block_size: the number of rows converted at once when scoring, small enough to stay in cache
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"unsupported dtype {dtype!r}, expected one of {DTYPES}")
+        if dtype == "int8" and scales is None:
+            raise ValueError("int8 compression needs fitted scales")
+        self.dtype = dtype
+        self.components = components
+        self.scales = scales
+        self.block_size = block_size
+        self._buffers = threading.local()
+
+    @classmethod
+    def fit(cls, matrix: np.ndarray, dtype: str = "float32", pca_dim: Optional[int] = None) -> "VectorCompressor":
+        """Fit the compressor to the sentence vectors.
+
+        :param matrix: the sentence vectors with shape `(num_sentences, dim)`
+        :param dtype: the storage type, one of `DTYPES`
+        :param pca_dim: the number of dimensions kept by the PCA down-projection, `None` keeps all of them
+        :return: the fitted compressor
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        components = None
+        if pca_dim is not None and pca_dim < matrix.shape[1]:
+            _, _, vt = np.linalg.svd(matrix, full_matrices=False)
+            components = vt[:pca_dim].astype(np.float32)
+            matrix = matrix.dot(components.T)
+        matrix = _normalize_rows(matrix)
+
+        scales = None
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=0) / 127
+            scales[scales == 0] = 1.0
+            scales = scales.astype(np.float32)
+
+        return cls(dtype=dtype, components=components, scales=scales)
+
+    @classmethod
+    def load(cls, path: Path) -> "VectorCompressor":
+        """Load the fitted parameters saved by `save`, the identity compressor is returned if the file is missing.
+
+        :param path: path to the `.npz` file
+        :return: the loaded compressor
+        """
+        if not Path(path).exists():
+            return cls()
+        with np.load(path) as params:
+            components = params["components"] if "components" in params.files else None
+            scales = params["scales"] if "scales" in params.files else None
+            return cls(dtype=str(params["dtype"]), components=components, scales=scales)
+
+    def save(self, path: Path) -> None:
+        """Save the fitted parameters to a `.npz` file.
+
+        :param path: path to the `.npz` file
+        """
+        params: Dict[str, Any] = {"dtype": np.array(self.dtype)}
+        if self.components is not None:
+            params["components"] = self.components
+        if self.scales is not None:
+            params["scales"] = self.scales
+        with open(path, "wb") as file:
+            np.savez(file, **params)
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """Apply the PCA down-projection.
+
+        :param vectors: a vector or a matrix of row vectors
+        :return: the projected float32 vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.components is None:
+            return vectors
+        return vectors.dot(self.components.T)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """Encode sentence vectors for storage.
+
+        :param matrix: the sentence vectors with shape `(num_sentences, dim)`
+        :return: the codes of the normalized vectors, zero vectors stay zero
+        """
+        matrix = _normalize_rows(self.project(matrix))
+        if self.dtype == "int8":
+            return np.clip(np.rint(matrix / self.scales), -127, 127).astype(np.int8)
+        return matrix.astype(self.dtype)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Decode stored codes back to (projected and normalized) float32 vectors.
+
+        :param codes: the codes returned by `encode`
+        :return: the float32 vectors
+        """
+        if self.dtype == "int8":
+            assert self.scales is not None
+            return codes.astype(np.float32) * self.scales
+        return codes.astype(np.float32)
+
+    def cosine_similarities(self, codes: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+        """Calculate the cosine similarity of a query to every stored vector.
+
+        :param codes: the codes returned by `encode`
+        :param query_vec: the (not projected) vector representing user's query
+        :return: the similarity to every row of `codes`, zero for a zero query such as an empty one
+        """
+        # the norm before the projection, which keeps the scores of queries outside the kept dimensions comparable
+        query_norm = np.linalg.norm(query_vec)
+        if query_norm == 0:
+            return np.zeros(len(codes), dtype=np.float32)
+        query_vec = self.project(query_vec) / query_norm
+        if self.dtype == "int8":
+            query_vec = query_vec * self.scales
+        if self.dtype == "float32":
+            return codes.dot(query_vec)
+
+        # convert cache-sized blocks into a reused buffer instead of the whole matrix
+        dots = np.empty(len(codes), dtype=np.float32)
+        buffer = self._get_buffer(codes.shape[1])
+        for i in range(0, len(codes), self.block_size):
+            block = codes[i : i + self.block_size]
+            np.copyto(buffer[: len(block)], block)
+            np.dot(buffer[: len(block)], query_vec, out=dots[i : i + len(block)])
+        return dots
+
+    def _get_buffer(self, dim: int) -> np.ndarray:
+        """Get the float32 conversion buffer of the calling thread."""
+        buffer = getattr(self._buffers, "buffer", None)
+        if buffer is None or buffer.shape != (self.block_size, dim):
+            buffer = np.empty((self.block_size, dim), dtype=np.float32)
+            self._buffers.buffer = buffer
+        return buffer
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix, leaving zero rows as they are."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+
+def check_topk_agreement(model: Any, queries: Optional[List[str]] = None, k: int = 3) -> Dict[str, float]:
+    """Compare the rankings of `Model.get_best_project_scores` to the exact float32 cosine ranking.
+
+    :param model: a loaded `Model`
+    :param queries: the queries to compare the rankings on, defaults to `DEFAULT_QUERIES`
+    :param k: the number of top projects compared
+    :return: a dict with the average top-k overlap, the share of queries with the same top-1 project and the same
+        top-k order, and the memory of the stored vectors compared to float32
+    """
+    queries = DEFAULT_QUERIES if queries is None else queries
+    embeddings = model.embeddings
+    index = model.index
+    exact = {
+        name: np.vstack([embeddings.get_sentence_vector(sentence) for sentence in sentences]).astype(np.float32)
+        for name, sentences in index.labelled_text.items()
+    }
+
+    overlap = 0.0
+    same_top1 = 0
+    same_order = 0
+    for query in queries:
+        query_vec = embeddings.get_sentence_vector(preprocessing.process_sentence(query))
+        exact_scores = []
+        for name, matrix in exact.items():
+            sims = matrix.dot(query_vec) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec))
+            exact_scores.append((name, float(np.mean(sims))))
+        expected = [name for name, _ in sorted(exact_scores, key=lambda x: x[1], reverse=True)[0:k]]
+        actual = [name for name, _ in model.get_best_project_scores(query, k)]
+
+        overlap += len(set(expected) & set(actual)) / max(len(expected), 1)
+        same_top1 += int(expected[0:1] == actual[0:1])
+        same_order += int(expected == actual)
+
+    num_queries = max(len(queries), 1)
+    float32_bytes = sum(matrix.nbytes for matrix in exact.values())
+    return {
+        "topk_overlap": overlap / num_queries,
+        "top1_agreement": same_top1 / num_queries,
+        "topk_order_agreement": same_order / num_queries,
+        "index_bytes": index.nbytes,
+        "float32_bytes": float32_bytes,
+        "compression_ratio": float32_bytes / max(index.nbytes, 1),
+    }
@@ -0,0 +1,180 @@
+"""The `dedup.py` module removes near-duplicate lines from a corpus file with MinHash and LSH."""
+import os
+import re
+import zlib
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+_MAX_HASH = np.uint64(_PRIME)
+_BAND_MULTIPLIER = np.uint64(1000003)
+_BLOCK_ROWS = 4096
+
+
+class DedupReport(NamedTuple):
+    """Size of the corpus before and after the near-duplicate removal."""
+
+    lines_in: int
+    lines_out: int
+    removed: int
+    reduction: float
+
+
+def choose_bands(num_perm: int, threshold: float, recall: float = 0.95) -> Tuple[int, int]:
+    """Choose the LSH banding with the most rows per band that still finds pairs at `threshold` with `recall`.
+
+    A pair with Jaccard similarity `s` shares a band with probability `1 - (1 - s ** rows) ** bands`. More rows mean
+    fewer dissimilar candidates, the candidates are compared on the whole signature afterwards anyway.
+
+    :param num_perm: the number of MinHash permutations
+    :param threshold: the Jaccard similarity above which lines are duplicates
+    :param recall: the minimal probability of a pair at `threshold` to become a candidate
+    :return: a pair `(bands, rows)` with `bands * rows <= num_perm`
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+def shingles(line: str, shingle_size: int = 5) -> List[str]:
+    """Split a line into overlapping character shingles, ignoring the case and repeated whitespace.
+
+    :param line: the line
+    :param shingle_size: the number of characters per shingle
+    :return: a list of shingles, empty for blank lines
+    """
+    text = re.sub(r"\s+", " ", line).strip().lower()
+    if len(text) <= shingle_size:
+        return [text] if text != "" else []
+    return [text[i : i + shingle_size] for i in range(0, len(text) - shingle_size + 1)]
+
+
+def minhash_signatures(lines: List[str], num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> np.ndarray:
+    """Calculate the MinHash signature of every line.
+
+    :param lines: the lines
+    :param num_perm: the number of permutations, i.e. the length of a signature
+    :param shingle_size: the number of characters per shingle
+    :param seed: the seed of the permutations, lines are only comparable with the same seed
+    :return: an array of shape `(len(lines), num_perm)`, rows of blank lines are set to the maximal hash
+    """
+    random_state = np.random.RandomState(seed)
+    a = random_state.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+    b = random_state.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    signatures = np.full((len(lines), num_perm), _MAX_HASH, dtype=np.uint64)
+    for i, line in enumerate(lines):
+        line_shingles = set(shingles(line, shingle_size))
+        if len(line_shingles) == 0:
+            continue
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in line_shingles], dtype=np.uint64) % _MAX_HASH
+        signatures[i] = ((hashes[:, None] * a + b) % _MAX_HASH).min(axis=0)
+    return signatures.astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """Hash every band of the signatures to a 64-bit key.
+
+    :param signatures: the signatures returned by `minhash_signatures`
+    :param bands: the number of bands
+    :param rows: the number of signature values per band
+    :return: an int64 array of shape `(len(signatures), bands)`
+    """
+    values = signatures[:, : bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for row in range(rows):
+        keys = keys * _BAND_MULTIPLIER + values[:, :, row]  # wraps around modulo 2 ** 64
+    return keys.view(np.int64)
+
+
+def _read_chunks(path: str, chunk_size: int) -> Iterator[List[str]]:
+    """Read a file in chunks of lines."""
+    with open(path, "r") as file:
+        while True:
+            chunk = list(islice(file, chunk_size))
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+
+def deduplicate_file(
+    corpus_path: str,
+    output_path: str,
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    chunk_size: int = 10000,
+    processes: Optional[int] = None,
+) -> DedupReport:
+    """Copy a corpus file without the lines that are near-duplicates of an earlier line.
+
+    The file is streamed in chunks whose signatures are calculated in a process pool, with at most two chunks per
+    process in flight. The first line of every group of near-duplicates is kept, blank lines are kept as they are.
+    Only the signatures of the kept lines stay in memory, in uint32 blocks, and every LSH bucket holds the first kept
+    line that fell into it, about `4 * num_perm + 100 * bands` bytes per kept line.
+
+    :param corpus_path: path to the corpus, one sentence per line
+    :param output_path: path the deduplicated corpus is written to
+    :param threshold: the estimated Jaccard similarity of the shingles above which lines are duplicates
+    :param num_perm: the number of MinHash permutations
+    :param shingle_size: the number of characters per shingle
+    :param chunk_size: the number of lines per chunk sent to a worker
+    :param processes: the number of worker processes, defaults to the number of cores
+    :return: the report of the size reduction
+    """
+    bands, rows = choose_bands(num_perm, threshold)
+    buckets: List[Dict[int, int]] = [{} for _ in range(bands)]
+    kept_blocks: List[np.ndarray] = []
+    num_kept = 0
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    lines_in = 0
+    lines_out = 0
+    with Pool(processes) as pool, open(output_path, "w") as output:
+        pending: "deque[Tuple[List[str], Any]]" = deque()
+        chunks = _read_chunks(corpus_path, chunk_size)
+        while True:
+            for chunk in islice(chunks, 2 * processes - len(pending)):
+                pending.append((chunk, pool.apply_async(minhash_signatures, (chunk, num_perm, shingle_size))))
+            if len(pending) == 0:
+                break
+            chunk, result = pending.popleft()
+            signatures = result.get()
+
+            for line, signature, keys in zip(chunk, signatures, band_keys(signatures, bands, rows).tolist()):
+                lines_in += 1
+                if line.strip() == "":
+                    output.write(line)
+                    lines_out += 1
+                    continue
+
+                candidates = {buckets[band][key] for band, key in enumerate(keys) if key in buckets[band]}
+                if any(
+                    np.mean(kept_blocks[kept // _BLOCK_ROWS][kept % _BLOCK_ROWS] == signature) >= threshold
+                    for kept in candidates
+                ):
+                    continue
+
+                if num_kept % _BLOCK_ROWS == 0:
+                    kept_blocks.append(np.empty((_BLOCK_ROWS, num_perm), dtype=np.uint32))
+                kept_blocks[-1][num_kept % _BLOCK_ROWS] = signature
+                for band, key in enumerate(keys):
+                    buckets[band].setdefault(key, num_kept)
+                num_kept += 1
+                output.write(line)
+                lines_out += 1
+
+    removed = lines_in - lines_out
+    return DedupReport(
+        lines_in=lines_in,
+        lines_out=lines_out,
+        removed=removed,
+        reduction=removed / lines_in if lines_in > 0 else 0.0,
+    )
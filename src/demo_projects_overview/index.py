@@ -0,0 +1,361 @@
+"""The `index.py` module holds the sentence vectors of the projects and supports updating single projects."""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import artifacts
+import numpy as np
+from compression import VectorCompressor
+
+
+class IndexData(NamedTuple):
+    """One immutable snapshot of the index contents. Every change builds a new snapshot."""
+
+    labelled_text: Dict[str, List[str]]
+    vectors: Dict[str, np.ndarray]
+    metadata: Dict[str, List[str]]
+    project_names: List[str]
+
+
+class SearchData(NamedTuple):
+    """All sentence vector codes of a snapshot stacked into one matrix for scoring."""
+
+    data: IndexData
+    names: List[str]
+    matrix: np.ndarray
+    offsets: np.ndarray
+    counts: np.ndarray
+
+
+class ProjectIndex:
+    """Sentence vectors of the projects with single-project upserts and removals.
+
+    The base files (`labelled-text.json`, `metadata.json` and `project_names.txt`) come from a published version and
+    are never modified. Changes are appended to `index-log.jsonl` in the artifacts directory, which is replayed on top
+    of every version loaded, so the changes survive retraining. Only the changed project gets embedded. Once the log
+    grows over `compact_threshold` entries, a new version with the changes folded in is published in a background
+    thread and the folded entries are dropped from the log. The changes are always folded into the current version,
+    which may be newer than the one loaded. Other processes pick up the changes with `refresh()`. Compaction assumes
+    the log has a single writing process.
+
+    The vectors are stored as the codes of a `VectorCompressor`, float32 unless a compressor was fitted at train time.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], np.ndarray],
+        paths: artifacts.ArtifactPaths,
+        artifacts_root: Optional[Path] = None,
+        compact_threshold: int = 100,
+        compressor: Optional[VectorCompressor] = None,
+    ) -> None:
+        """
+        Load the base files of a version and replay the log.
+
+        :param embed: a function returning the vector of a sentence
+        :param paths: the paths of the version
+        :param artifacts_root: the artifacts directory holding the log, defaults to `artifacts.default_root()`
+        :param compact_threshold: the number of log entries that triggers a compaction
+        :param compressor: the compressor encoding the stored vectors, defaults to plain float32
+        """
+        self.embed = embed
+        self.paths = paths
+        self.artifacts_root = artifacts_root
+        self.log_path = artifacts.index_log_path(artifacts_root)
+        self.compact_threshold = compact_threshold
+        self.compressor = VectorCompressor() if compressor is None else compressor
+
+        self._write_lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._search: Optional[SearchData] = None
+        self._data = IndexData(labelled_text={}, vectors={}, metadata={}, project_names=[])
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        self._log_entries = 0
+        with self._write_lock:
+            self._load()
+
+    @property
+    def project_names(self) -> List[str]:
+        """Get the names of the projects."""
+        return self._data.project_names
+
+    @property
+    def labelled_text(self) -> Dict[str, List[str]]:
+        """Get the sentences of every project."""
+        return self._data.labelled_text
+
+    @property
+    def metadata(self) -> Dict[str, List[str]]:
+        """Get the metadata of every project, including the `header` row."""
+        return self._data.metadata
+
+    @property
+    def nbytes(self) -> int:
+        """Get the memory taken by the stored vectors."""
+        return self._get_search_data().matrix.nbytes
+
+    def build(self) -> None:
+        """Build the search matrix of the current snapshot now instead of on the first query."""
+        self._get_search_data()
+
+    def score(self, query_vec: np.ndarray) -> List[Tuple[str, float]]:
+        """Calculate the average cosine similarity of the query to the sentences of every project.
+
+        :param query_vec: the vector representing user's query
+        :return: a list of pairs `(project_name, score)` in the index order, every score is 0 for a zero query
+        """
+        search = self._get_search_data()
+        if len(search.names) == 0:
+            return []
+        sims = self.compressor.cosine_similarities(search.matrix, query_vec)
+        scores = np.add.reduceat(sims, search.offsets) / search.counts
+        return list(zip(search.names, scores.tolist()))
+
+    def upsert_project(self, name: str, sentences: List[str], metadata: Optional[List[str]] = None) -> None:
+        """Add a project or replace its sentences and metadata.
+
+        :param name: the project name
+        :param sentences: the processed sentences describing the project
+        :param metadata: the metadata row of the project, ordered as the `header` row
+        """
+        if len(sentences) == 0:
+            raise ValueError(f"project {name!r} needs at least one sentence")
+        if metadata is None and name not in self._data.metadata:
+            raise ValueError(f"new project {name!r} needs its metadata")
+        header = self._data.metadata.get("header")
+        if metadata is not None and header is not None and len(metadata) != len(header):
+            raise ValueError(f"metadata of {name!r} has {len(metadata)} fields, expected {len(header)}")
+        self._append({"op": "upsert", "name": name, "sentences": sentences, "metadata": metadata})
+
+    def remove_project(self, name: str) -> None:
+        """Remove a project.
+
+        :param name: the project name
+        """
+        if name not in self._data.labelled_text and name not in self._data.project_names:
+            raise KeyError(name)
+        self._append({"op": "remove", "name": name})
+
+    def refresh(self) -> None:
+        """Apply the log entries written by other processes since the last refresh.
+
+        If another process compacted the log meanwhile, the index switches to the base files of the version it
+        published, so the owner of the index should load the embeddings of that version as well.
+        """
+        with self._write_lock:
+            try:
+                inode = os.stat(self.log_path).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode != self._log_inode:
+                # the log was trimmed after its entries were published as the current version, so reload the base
+                # files of that version, reusing the unchanged vectors
+                version = artifacts.get_current_version(self.artifacts_root)
+                self.load_version(artifacts.resolve_paths(version, self.artifacts_root))
+            else:
+                self._apply_log()
+
+    def load_version(self, paths: artifacts.ArtifactPaths) -> None:
+        """Switch to the base files of another version and replay the log on top of them.
+
+        Only the sentences that differ from the loaded ones get embedded, so this is cheap for versions published by a
+        compaction. The embeddings of the other version must be the ones `embed` uses.
+
+        :param paths: the paths of the version
+        """
+        with self._write_lock:
+            old_paths = self.paths
+            self.paths = paths
+            try:
+                self._load()
+            except Exception:
+                self.paths = old_paths
+                raise
+
+    def compact(self) -> Optional[str]:
+        """Publish a new version with the log folded in and keep only the entries appended in the meantime.
+
+        :return: the published version, `None` if the log was empty
+        """
+        with self._compact_lock:
+            with self._write_lock:
+                self.refresh()
+                if self._log_entries == 0:
+                    return None
+                version = artifacts.get_current_version(self.artifacts_root)
+                if version != self.paths.version:
+                    # a retrain published a version after this one was loaded, fold the log into that one instead
+                    self.load_version(artifacts.resolve_paths(version, self.artifacts_root))
+                data = self._data
+                paths = self.paths
+                compacted_offset = self._log_offset
+                compacted_entries = self._log_entries
+
+            staging_dir = Path(tempfile.mkdtemp(prefix="index-compaction-"))
+            try:
+                with open(staging_dir / artifacts.LABELLED_TEXT_FILE, "w") as json_file:
+                    json.dump(data.labelled_text, json_file)
+                with open(staging_dir / artifacts.METADATA_FILE, "w") as json_file:
+                    json.dump(data.metadata, json_file)
+                with open(staging_dir / artifacts.PROJECT_NAMES_FILE, "w") as file:
+                    for name in data.project_names:
+                        file.write(name + "\n")
+                version = artifacts.publish(
+                    embeddings_path=str(paths.embeddings),
+                    labelled_text_path=str(staging_dir / artifacts.LABELLED_TEXT_FILE),
+                    metadata_path=str(staging_dir / artifacts.METADATA_FILE),
+                    project_names_path=str(staging_dir / artifacts.PROJECT_NAMES_FILE),
+                    compression_path=str(paths.compression) if paths.compression.exists() else None,
+                    root=self.artifacts_root,
+                )
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+            # the log is trimmed only once the new version is current, so readers never miss a change
+            with self._write_lock:
+                with open(self.log_path, "rb") as file:
+                    file.seek(compacted_offset)
+                    tail = file.read()
+                self._write_atomically(self.log_path, tail.decode("utf-8"))
+                self._log_inode = os.stat(self.log_path).st_ino
+                self._log_offset -= compacted_offset
+                self._log_entries -= compacted_entries
+                self.paths = artifacts.resolve_paths(version, self.artifacts_root)
+            return version
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """Append an entry to the log and apply every entry not applied yet, including this one."""
+        with self._write_lock:
+            self.refresh()
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            if self._log_inode is None:
+                self._log_inode = os.stat(self.log_path).st_ino
+            self._apply_log()
+
+        if self._log_entries > self.compact_threshold and not self._compact_lock.locked():
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        """Compact the log, reporting a failure instead of losing it with the thread."""
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Failed to compact the index log: {e}")
+
+    def _load(self) -> None:
+        """Load the base files and replay the whole log."""
+        with open(self.paths.labelled_text, "r") as file:
+            labelled_text = json.load(file)
+        with open(self.paths.metadata, "r") as file:
+            metadata = json.load(file)
+        with open(self.paths.project_names, "r") as file:
+            project_names = [name.strip() for name in file if name.strip() != ""]
+
+        old = self._data
+        vectors = {}
+        for name, sentences in labelled_text.items():
+            if old.labelled_text.get(name) == sentences:
+                vectors[name] = old.vectors[name]
+            else:
+                vectors[name] = self._embed_sentences(sentences)
+
+        self._data = IndexData(
+            labelled_text=labelled_text, vectors=vectors, metadata=metadata, project_names=project_names
+        )
+        try:
+            self._log_inode = os.stat(self.log_path).st_ino
+        except FileNotFoundError:
+            self._log_inode = None
+        self._log_offset = 0
+        self._log_entries = 0
+        self._apply_log()
+
+    def _apply_log(self) -> None:
+        """Apply the log entries after the current offset."""
+        if self._log_inode is None:
+            return
+        with open(self.log_path, "rb") as file:
+            file.seek(self._log_offset)
+            lines = file.readlines()
+
+        data = self._data
+        for line in lines:
+            if not line.endswith(b"\n"):
+                break  # an entry still being written
+            data = self._apply_entry(data, json.loads(line))
+            self._log_offset += len(line)
+            self._log_entries += 1
+        self._data = data
+
+    def _apply_entry(self, data: IndexData, entry: Dict[str, Any]) -> IndexData:
+        """Build the snapshot with one log entry applied."""
+        name = entry["name"]
+        labelled_text = dict(data.labelled_text)
+        vectors = dict(data.vectors)
+        metadata = dict(data.metadata)
+        project_names = list(data.project_names)
+
+        if entry["op"] == "upsert":
+            if labelled_text.get(name) != entry["sentences"]:
+                vectors[name] = self._embed_sentences(entry["sentences"])
+            labelled_text[name] = entry["sentences"]
+            if entry["metadata"] is not None:
+                metadata[name] = entry["metadata"]
+            if name not in project_names:
+                project_names.append(name)
+        elif entry["op"] == "remove":
+            labelled_text.pop(name, None)
+            vectors.pop(name, None)
+            metadata.pop(name, None)
+            project_names = [project for project in project_names if project != name]
+
+        return IndexData(
+            labelled_text=labelled_text, vectors=vectors, metadata=metadata, project_names=project_names
+        )
+
+    def _embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        """Stack the vectors of the sentences into a matrix of codes."""
+        return self.compressor.encode(np.vstack([self.embed(sentence) for sentence in sentences]))
+
+    def _get_search_data(self) -> SearchData:
+        """Get the stacked matrix of the current snapshot, building it on the first query after a change."""
+        data = self._data
+        search = self._search
+        if search is not None and search.data is data:
+            return search
+
+        names = list(data.labelled_text.keys())
+        blocks = [data.vectors[name] for name in names]
+        counts = np.array([len(block) for block in blocks], dtype=np.int64)
+        if len(blocks) > 0:
+            matrix = np.vstack(blocks)
+        else:
+            matrix = np.zeros((0, 0), dtype=self.compressor.dtype)
+        search = SearchData(
+            data=data,
+            names=names,
+            matrix=matrix,
+            offsets=np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64),
+            counts=counts,
+        )
+        self._search = search
+        return search
+
+    @staticmethod
+    def _write_atomically(path: Path, content: str) -> None:
+        """Write a file next to its destination and rename it into place."""
+        tmp_path = path.parent / f".{path.name}-{os.getpid()}"
+        with open(tmp_path, "w") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
@@ -7,6 +7,12 @@ from model import Model
 from streamlit import cli as stcli
 
 
+@st.cache(allow_output_mutation=True)
+def load_model() -> Model:
+    """Load the model once and share it between sessions, it reloads new artifact versions by itself."""
+    return Model()
+
+
 def main() -> None:
     """Run the streamlit app."""
     st.title("Demo of projects implemented by Radix")
@@ -15,7 +21,7 @@ def main() -> None:
     *Search for the Radix's projects most related to what you are looking for*
     """
     )
-    model = Model()
+    model = load_model()
 
     with st.form(key="my_form"):
         user_input = st.text_input("Key words", "sentiment analysis, aws")
@@ -1,33 +1,163 @@
 """Handles predictions based on serialized model."""
-import json
+import threading
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
+import artifacts
 import fasttext
 import numpy as np
 import pandas as pd
 import preprocessing
+from compression import VectorCompressor
+from index import ProjectIndex
+from token_cache import TokenVectorCache
+
+
+class ModelState(NamedTuple):
+    """Everything loaded from one version of the artifacts.
+
+    The state is replaced as a whole when a new version with other embeddings is loaded. Its project index changes in
+    place, to apply single-project changes and versions that only differ in their projects, such as compactions.
+    """
+
+    version: str
+    embeddings: Any
+    token_cache: TokenVectorCache
+    project_index: ProjectIndex
 
 
 class Model:
-    """Handles predictions based on serialized model."""
+    """Handles predictions based on serialized model.
+
+    The loaded artifacts are kept in a single `ModelState`. When a new version gets published, the new state is built
+    in a background thread and swapped in with one assignment, so queries in flight finish on the old state. Single
+    projects can be changed in place with `upsert_project` and `remove_project`.
+    """
+
+    def __init__(
+        self,
+        artifacts_root: Optional[str] = None,
+        watch_interval: Optional[float] = 5.0,
+        token_cache_size: int = 100000,
+        compact_threshold: int = 100,
+    ) -> None:
+        """
+        Load the current version of the artifacts.
 
-    def __init__(self) -> None:
-        self.embeddings = fasttext.load_model(
-            str(Path(__file__).parent / "embeddings/fasttext-embeddings.bin")
+        :param artifacts_root: the directory with published artifact versions, defaults to `artifacts.default_root()`
+        :param watch_interval: seconds between checks for a new version, `None` disables the watcher
+        :param token_cache_size: the maximum number of word vectors cached for embedding queries
+        :param compact_threshold: the number of project changes logged before they are published as a new version
+        """
+        self.artifacts_root = None if artifacts_root is None else Path(artifacts_root)
+        self.token_cache_size = token_cache_size
+        self.compact_threshold = compact_threshold
+        self._reload_lock = threading.Lock()
+        self._state = self.load_state(artifacts.get_current_version(self.artifacts_root))
+        self._stop_watching = threading.Event()
+        if watch_interval is not None:
+            watcher = threading.Thread(target=self._watch, args=(watch_interval,), daemon=True)
+            watcher.start()
+
+    @property
+    def version(self) -> str:
+        """Get the version of the artifacts currently in use."""
+        return self._state.version
+
+    @property
+    def embeddings(self) -> Any:
+        """Get the fasttext model currently in use."""
+        return self._state.embeddings
+
+    @property
+    def project_names(self) -> List[str]:
+        """Get the project names currently in use."""
+        return self._state.project_index.project_names
+
+    @property
+    def index(self) -> ProjectIndex:
+        """Get the project index currently in use."""
+        return self._state.project_index
+
+    def load_state(self, version: str) -> ModelState:
+        """Load all artifacts of a version.
+
+        :param version: the version to load
+        :return: the loaded state
+        """
+        paths = artifacts.resolve_paths(version, self.artifacts_root)
+        embeddings = fasttext.load_model(str(paths.embeddings))
+        index = ProjectIndex(
+            embed=embeddings.get_sentence_vector,
+            paths=paths,
+            artifacts_root=self.artifacts_root,
+            compact_threshold=self.compact_threshold,
+            compressor=VectorCompressor.load(paths.compression),
         )
-        self.project_names = self.load_project_names()
+        return ModelState(
+            version=version,
+            embeddings=embeddings,
+            token_cache=TokenVectorCache(embeddings, max_size=self.token_cache_size),
+            project_index=index,
+        )
+
+    def reload(self) -> bool:
+        """Swap in the current version of the artifacts if it differs from the one in use.
 
-    def load_project_names(self) -> List[str]:
-        """Load project names to list from `project_names.txt`.
+        Project changes logged by other processes are applied as well. A version sharing the embeddings and the
+        compression of the one in use, as published by a compaction, only reloads the projects.
 
-        :return: the loaded list of project names
+        :return: `True` if a new version was swapped in
         """
-        project_names = []
-        with open(Path(__file__).parent / "corpus/project_names.txt", "r") as file:
-            for name in file:
-                project_names.append(name.strip())
-        return project_names
+        with self._reload_lock:
+            state = self._state
+            version = artifacts.get_current_version(self.artifacts_root)
+            if version == state.version:
+                state.project_index.refresh()
+                # a compaction publishes its version before trimming the log, so check again after the refresh
+                version = artifacts.get_current_version(self.artifacts_root)
+                if version == state.version:
+                    return False
+
+            paths = artifacts.resolve_paths(version, self.artifacts_root)
+            old_paths = artifacts.resolve_paths(state.version, self.artifacts_root)
+            if artifacts.same_file(paths.embeddings, old_paths.embeddings) and artifacts.same_file(
+                paths.compression, old_paths.compression
+            ):
+                state.project_index.load_version(paths)
+                self._state = state._replace(version=version)
+            else:
+                self._state = self.load_state(version)
+            return True
+
+    def stop_watching(self) -> None:
+        """Stop the background check for new versions."""
+        self._stop_watching.set()
+
+    def _watch(self, interval: float) -> None:
+        """Periodically reload the artifacts, keeping the old state if the new version fails to load."""
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Failed to reload the artifacts: {e}")
+
+    def upsert_project(self, name: str, description: str, metadata: Optional[List[str]] = None) -> None:
+        """Add a project or replace its description and metadata, embedding only its sentences.
+
+        :param name: the project name
+        :param description: the project description, split into sentences like in `labelled-text.json`
+        :param metadata: the metadata row of the project, ordered as the `header` of `metadata.json`, required for new
+            projects
+        """
+        self._state.project_index.upsert_project(name, preprocessing.description_to_sentences(description), metadata)
+
+    def remove_project(self, name: str) -> None:
+        """Remove a project.
+
+        :param name: the project name
+        """
+        self._state.project_index.remove_project(name)
 
     def get_best_project_scores(self, user_input: str, num_outputs: int) -> List[Tuple[str, float]]:
         """
@@ -37,26 +167,21 @@ class Model:
         :param num_outputs: the number of desired outputs (predictions)
         :return: 2D nested list where each nested list consists of a pair `[project_name, score]`
         """
-        scores: Dict[str, float] = {}
+        state = self._state
         # get vector of query sent
-        query_vec = self.embeddings.get_sentence_vector(preprocessing.process_sentence(user_input))
-        # load dict of text labelled with the project title
-        with open(Path(__file__).parent / "corpus/labelled-text.json", "r") as file:
-            labelled_text = json.load(file)
-
-        for key in labelled_text.keys():
-            scores[key] = 0
-            scores_list = []
-            sentences = labelled_text.get(key)
+        query_vec = state.token_cache.get_sentence_vector(preprocessing.process_sentence(user_input))
+        # average cosine similarity to the sentences of every project
+        scores = state.project_index.score(query_vec)
 
-            for sentence in sentences:
-                sentence_vec = self.embeddings.get_sentence_vector(sentence)
-                scores_list.append(self.calculate_cosine_similarity(sentence_vec, query_vec))
+        sorted_scores = sorted(scores, key=lambda x: x[1], reverse=True)
+        return sorted_scores[0:num_outputs]
 
-            scores[key] = sum(scores_list) / len(scores_list)
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Get the hit-rate statistics of the word vector cache used for queries.
 
-        sorted_scores = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_scores[0:num_outputs]
+        :return: a dict with the number of hits, misses, cached tokens and the hit rate
+        """
+        return self._state.token_cache.get_stats()
 
     def calculate_cosine_similarity(self, query_vec: str, sent_vec: str) -> Any:
         """Calculate the cosine similarity of two sentence vectors (indicates the closeness of two vectors).
@@ -72,10 +197,15 @@ class Model:
     def get_metadata_df(self, project_names: List[str]) -> pd.DataFrame:
         """Get dataframe of metadata.
 
+        Projects removed since they were scored, e.g. by a reload in between, are left out instead of failing.
+
         :param project_names: names of projects to which metadata will be returned
-        :return: a pd.DataFrame of metadata for each project in `project_names`.
+        :return: a pd.DataFrame of metadata for each project in `project_names` that still exists.
         """
-        metadata = preprocessing.load_metadata(str(Path(__file__).parent / "corpus/metadata.json"))
+        metadata = self._state.project_index.metadata
+        project_names = [name for name in project_names if name in metadata and name != "header"]
+        if len(project_names) == 0:
+            return pd.DataFrame(columns=metadata.get("header", []) + ["Project name"])
         df = preprocessing.metadata_to_df(metadata, project_names)
         return df
 
@@ -5,6 +5,7 @@ import shutil
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+import dedup
 import pandas as pd
 import regex as re
 from nltk import sent_tokenize
@@ -43,18 +44,31 @@ def extract_sentences(
     return sentences
 
 
-def append_to_corpus(sentences: List[List[str]], boosting_percentage: float = 0.05) -> None:
+def append_to_corpus(
+    sentences: List[List[str]], boosting_percentage: float = 0.05, dedup_threshold: Optional[float] = None
+) -> None:
     """Append the sentences to corpus.
 
     :param sentences: a list of sentences returned from `extract_sentences` :param corpus_path: path to the corpus
     :param boosting_percentage: specifies the number of repetitions by which the `sentences` are added to the corpus
         refers to the proportion of lines from the corpus
+    :param dedup_threshold: if set, near-duplicate lines of the scraped corpus with at least this estimated Jaccard
+        similarity are removed first. The number of repetitions of `sentences` is still based on the original corpus.
     """
     old_corpus_path = str(Path(__file__).parent / "corpus/corpus-without-radix-data.txt")
+    num_lines = sum(1 for line in open(old_corpus_path))
+
+    if dedup_threshold is not None:
+        deduplicated_path = str(Path(__file__).parent / "corpus/corpus-deduplicated.txt")
+        report = dedup.deduplicate_file(old_corpus_path, deduplicated_path, threshold=dedup_threshold)
+        print(
+            f"Removed {report.removed} near-duplicate lines out of {report.lines_in} "
+            + f"({report.reduction:.1%} of the scraped corpus)"
+        )
+        old_corpus_path = deduplicated_path
 
     corpus_path = str(Path(__file__).parent / "corpus/corpus-merged.txt")
     shutil.copyfile(old_corpus_path, corpus_path)
-    num_lines = sum(1 for line in open(corpus_path))
     with open(corpus_path, "a") as file:
         iteration = 0
         while iteration < round(num_lines * boosting_percentage):
@@ -94,6 +108,15 @@ def process_sentence(sentence: str) -> Any:
     return sent
 
 
+def description_to_sentences(description: str) -> List[str]:
+    """Split a project description into processed sentences.
+
+    :param description: the project description
+    :return: a list of processed sentences
+    """
+    return [process_sentence(sentence) for sentence in sent_tokenize(description)]
+
+
 def make_metadata_file(
     filepath: str, selected_cols: Optional[List[int]] = None, append: bool = True
 ) -> None:
@@ -177,15 +200,13 @@ def save_as_labelled_text_to_json(filepath: str, include_confidential: bool) ->
     if include_confidential is True:
         labelled_text = {}
         for i in range(0, len(df)):
-            sentences = sent_tokenize(df.iloc[i, 3])
-            labelled_text[df.iloc[i, 2]] = [process_sentence(sentence) for sentence in sentences]
+            labelled_text[df.iloc[i, 2]] = description_to_sentences(df.iloc[i, 3])
     else:
         labelled_text = {}
         for i in range(0, len(df)):
             if df.iloc[i, -1] == "Yes":  # check if the record in the row is confidential
                 break
-            sentences = sent_tokenize(df.iloc[i, 3])
-            labelled_text[df.iloc[i, 2]] = [process_sentence(sentence) for sentence in sentences]
+            labelled_text[df.iloc[i, 2]] = description_to_sentences(df.iloc[i, 3])
 
     with open(str(Path(__file__).parent / "corpus/labelled-text.json"), "w") as json_file:
         json.dump(labelled_text, json_file)
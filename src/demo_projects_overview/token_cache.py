@@ -0,0 +1,100 @@
+"""The `token_cache.py` module caches per-token word vectors in front of a fasttext model."""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# `std::istringstream >> word` used by fasttext splits on these characters only
+_WHITESPACE = re.compile(r"[ \t\n\v\f\r]+")
+
+
+class TokenVectorCache:
+    """Bounded LRU cache of normalized word vectors used to compose sentence vectors.
+
+    fasttext computes a sentence vector as the average of the L2-normalized vectors of its tokens, skipping tokens
+    whose vector is zero. Word vectors of out-of-vocabulary tokens are composed from their character n-grams, which
+    is the expensive part, so caching them makes repeated keywords almost free.
+    """
+
+    def __init__(self, embeddings: Any, max_size: int = 100000) -> None:
+        """
+        Create an empty cache.
+
+        :param embeddings: the fasttext model
+        :param max_size: the maximum number of cached tokens
+        """
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self._vectors: "OrderedDict[str, Optional[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_normalized_word_vector(self, word: str) -> Optional[np.ndarray]:
+        """Get the L2-normalized vector of a token.
+
+        :param word: the token
+        :return: the normalized vector, or `None` if the token's vector is zero and fasttext would skip it
+        """
+        with self._lock:
+            if word in self._vectors:
+                self._vectors.move_to_end(word)
+                self.hits += 1
+                return self._vectors[word]
+            self.misses += 1
+
+        vec = np.asarray(self.embeddings.get_word_vector(word), dtype=np.float32)
+        norm = np.float32(np.sqrt(np.dot(vec, vec)))
+        normalized = vec * np.float32(1.0 / norm) if norm > 0 else None
+
+        with self._lock:
+            self._vectors[word] = normalized
+            if len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+        return normalized
+
+    def get_sentence_vector(self, text: str) -> np.ndarray:
+        """Compose a sentence vector the same way as `fasttext.get_sentence_vector` does.
+
+        :param text: the sentence
+        :return: the average of the normalized token vectors
+        """
+        if text.find("\n") != -1:
+            raise ValueError("predict processes one line at a time (remove '\\n')")
+
+        sentence_vec = np.zeros(self.embeddings.get_dimension(), dtype=np.float32)
+        count = 0
+        for word in _WHITESPACE.split(text):
+            if word == "":
+                continue
+            vec = self.get_normalized_word_vector(word)
+            if vec is not None:
+                sentence_vec += vec
+                count += 1
+
+        if count > 0:
+            sentence_vec *= np.float32(1.0 / count)
+        return sentence_vec
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get the hit-rate statistics of the cache.
+
+        :return: a dict with the number of hits, misses, cached tokens and the hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._vectors),
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Remove all cached tokens and reset the statistics."""
+        with self._lock:
+            self._vectors.clear()
+            self.hits = 0
+            self.misses = 0
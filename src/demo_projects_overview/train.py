@@ -1,12 +1,26 @@
 """The `train.py` module provides functionality to re-train embedding model with new dataset."""
+import json
+import os
 from pathlib import Path
+from typing import Any, Optional
 
+import artifacts
+import compression
 import fasttext
+import numpy as np
 import preprocessing
+from compression import VectorCompressor
+from model import Model
 
 
 def train(
-    new_data_path: str, include_confidential: bool = False, boosting_percentage: float = 0.05
+    new_data_path: str,
+    include_confidential: bool = False,
+    boosting_percentage: float = 0.05,
+    publish: bool = True,
+    compression_dtype: str = "float32",
+    pca_dim: Optional[int] = None,
+    dedup_threshold: Optional[float] = None,
 ) -> None:
     """Append the new dataset to the existing corpus.Train new fasttext embedding model with new extended corpus.
 
@@ -14,13 +28,22 @@ def train(
     :param include_confidential: indicates if confidential projects should be included
     :param boosting_percentage: the percentage by which the new data should be duplicated in the corpus
         (the percentage corresponds to percentage from the initial stack overflow corpus). The default is set to 5%.
+    :param publish: if the trained artifacts should be published as a new version picked up by running `Model`s
+    :param compression_dtype: the storage type of the project sentence vectors, `float32`, `float16` or `int8`
+    :param pca_dim: the number of dimensions the project sentence vectors are projected to, `None` keeps all of them
+    :param dedup_threshold: the similarity above which near-duplicate lines are removed from the scraped corpus,
+        `None` keeps the corpus as it is. The boosting of the project sentences is not affected.
     """
+    if compression_dtype not in compression.DTYPES:
+        raise ValueError(f"unsupported compression dtype {compression_dtype!r}, expected one of {compression.DTYPES}")
     sentences = preprocessing.extract_sentences(
         new_data_path=new_data_path,
         selected_cols=None,
         include_confidential=include_confidential,
     )
-    preprocessing.append_to_corpus(sentences=sentences, boosting_percentage=boosting_percentage)
+    preprocessing.append_to_corpus(
+        sentences=sentences, boosting_percentage=boosting_percentage, dedup_threshold=dedup_threshold
+    )
     preprocessing.make_metadata_file(filepath=new_data_path, append=False)
     preprocessing.save_project_names_to_file(
         filepath=new_data_path, include_confidential=include_confidential
@@ -34,5 +57,59 @@ def train(
     )
     model.save_model(str(Path(__file__).parent / "embeddings/fasttext-embeddings.bin"))
 
+    paths = artifacts.resolve_paths(artifacts.LEGACY_VERSION)
+    compression_path = fit_compression(
+        model=model,
+        labelled_text_path=str(paths.labelled_text),
+        compression_path=str(paths.compression),
+        compression_dtype=compression_dtype,
+        pca_dim=pca_dim,
+    )
+
+    if publish is True:
+        version = artifacts.publish(
+            embeddings_path=str(paths.embeddings),
+            labelled_text_path=str(paths.labelled_text),
+            metadata_path=str(paths.metadata),
+            project_names_path=str(paths.project_names),
+            compression_path=compression_path,
+        )
+        print(f"Published artifacts version: {version}")
+        if compression_path is not None:
+            agreement = compression.check_topk_agreement(Model(watch_interval=None))
+            print(f"Rankings of the compressed vectors compared to float32: {agreement}")
+
+
+def fit_compression(
+    model: Any,
+    labelled_text_path: str,
+    compression_path: str,
+    compression_dtype: str = "float32",
+    pca_dim: Optional[int] = None,
+) -> Optional[str]:
+    """Fit the compression of the project sentence vectors and save it.
+
+    :param model: the trained fasttext model
+    :param labelled_text_path: path to the `labelled-text.json` file
+    :param compression_path: path the fitted compression is saved to
+    :param compression_dtype: the storage type of the project sentence vectors, `float32`, `float16` or `int8`
+    :param pca_dim: the number of dimensions the project sentence vectors are projected to, `None` keeps all of them
+    :return: the path of the saved compression, `None` if the vectors are kept as float32
+    """
+    if compression_dtype == "float32" and pca_dim is None:
+        if os.path.exists(compression_path):  # drop the compression fitted for a previous model
+            os.remove(compression_path)
+        return None
+
+    with open(labelled_text_path, "r") as file:
+        labelled_text = json.load(file)
+    matrix = np.vstack(
+        [model.get_sentence_vector(sentence) for sentences in labelled_text.values() for sentence in sentences]
+    )
+    compressor = VectorCompressor.fit(matrix, dtype=compression_dtype, pca_dim=pca_dim)
+    compressor.save(Path(compression_path))
+    return compression_path
+
 
-train(str(Path(__file__).parent / "Project-description.csv"), include_confidential=False)
+if __name__ == "__main__":
+    train(str(Path(__file__).parent / "Project-description.csv"), include_confidential=False)
@@ -0,0 +1,53 @@
+"""Make the flat modules of the package importable the same way the app imports them."""
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "demo_projects_overview"))
+
+import artifacts  # noqa: E402
+
+WORDS = "aws nlp forecasting classification sentiment analysis pytorch vision deployment ec2 model data".split()
+HEADER = ["Technologies", "Client"]
+
+
+@pytest.fixture(scope="session")
+def embeddings_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Train and save a small unsupervised fasttext model."""
+    fasttext = pytest.importorskip("fasttext")
+    rng = random.Random(0)
+    directory = Path(tmp_path_factory.mktemp("embeddings"))
+    corpus = directory / "corpus.txt"
+    corpus.write_text("".join(" ".join(rng.choice(WORDS) for _ in range(10)) + "\n" for _ in range(2000)))
+    embeddings = fasttext.train_unsupervised(str(corpus), dim=16, epoch=1, minCount=1, thread=1, verbose=0)
+    path = directory / artifacts.EMBEDDINGS_FILE
+    embeddings.save_model(str(path))
+    return path
+
+
+def publish_catalog(root: Path, embeddings_path: Path, labelled_text: dict) -> str:
+    """Publish a version with the given projects and embeddings."""
+    staging = root.parent / "staging"
+    staging.mkdir(exist_ok=True)
+    (staging / artifacts.LABELLED_TEXT_FILE).write_text(json.dumps(labelled_text))
+    metadata = {"header": HEADER, **{name: ["python", name] for name in labelled_text}}
+    (staging / artifacts.METADATA_FILE).write_text(json.dumps(metadata))
+    (staging / artifacts.PROJECT_NAMES_FILE).write_text("".join(name + "\n" for name in labelled_text))
+    return artifacts.publish(
+        embeddings_path=str(embeddings_path),
+        labelled_text_path=str(staging / artifacts.LABELLED_TEXT_FILE),
+        metadata_path=str(staging / artifacts.METADATA_FILE),
+        project_names_path=str(staging / artifacts.PROJECT_NAMES_FILE),
+        root=root,
+    )
+
+
+@pytest.fixture
+def model_root(tmp_path: Path, embeddings_path: Path) -> Path:
+    """Create an artifacts directory with the projects A and B and real embeddings."""
+    root = tmp_path / "model-artifacts"
+    publish_catalog(root, embeddings_path, {"A": ["aws deployment ec2"], "B": ["nlp sentiment analysis"]})
+    return root
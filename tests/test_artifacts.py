@@ -0,0 +1,48 @@
+"""Tests for publishing and resolving the artifact versions."""
+from pathlib import Path
+
+import artifacts
+import pytest
+
+
+@pytest.fixture
+def files(tmp_path: Path) -> dict:
+    """Create the files of one version."""
+    files = {}
+    for name in ["embeddings", "labelled_text", "metadata", "project_names"]:
+        files[f"{name}_path"] = str(tmp_path / name)
+        (tmp_path / name).write_text(name)
+    return files
+
+
+def test_nothing_published_is_legacy(tmp_path: Path) -> None:
+    assert artifacts.get_current_version(tmp_path / "artifacts") == artifacts.LEGACY_VERSION
+
+
+def test_publish_switches_current(tmp_path: Path, files: dict) -> None:
+    root = tmp_path / "artifacts"
+    version = artifacts.publish(**files, root=root)
+
+    assert artifacts.get_current_version(root) == version
+    assert artifacts.list_versions(root) == [version]
+    paths = artifacts.resolve_paths(version, root)
+    assert paths.embeddings.read_text() == "embeddings"
+    assert paths.project_names.read_text() == "project_names"
+    assert not paths.compression.exists()
+
+
+def test_prune_keeps_the_latest_versions(tmp_path: Path, files: dict) -> None:
+    root = tmp_path / "artifacts"
+    versions = [artifacts.publish(**files, root=root, keep=2) for _ in range(4)]
+
+    assert artifacts.list_versions(root) == versions[2:]
+
+
+def test_prune_never_deletes_current(tmp_path: Path, files: dict) -> None:
+    root = tmp_path / "artifacts"
+    versions = [artifacts.publish(**files, root=root) for _ in range(3)]
+    artifacts.set_current_version(versions[0], root)
+
+    artifacts.prune_versions(root, keep=1)
+
+    assert artifacts.list_versions(root) == [versions[0], versions[2]]
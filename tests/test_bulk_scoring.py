@@ -0,0 +1,38 @@
+"""Tests for resuming the offline scoring of `bulk_scoring`."""
+import json
+from pathlib import Path
+
+import pytest
+from bulk_scoring import count_done_rows, score_file
+
+pytest.importorskip("fasttext")
+
+QUERIES = ["aws deployment", "nlp sentiment", 5, "", "pytorch vision", "ec2", "model data"]
+
+
+def test_count_done_rows_drops_partial_line(tmp_path: Path) -> None:
+    output = tmp_path / "output.jsonl"
+    output.write_text('{"id": 0}\n{"id": 1}\n{"id": 2, "que')
+
+    assert count_done_rows(str(output)) == 2
+    assert output.read_text() == '{"id": 0}\n{"id": 1}\n'
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_resume_writes_every_row_once(tmp_path: Path, model_root: Path, suffix: str) -> None:
+    input_path = tmp_path / f"queries{suffix}"
+    if suffix == ".jsonl":
+        input_path.write_text("".join(json.dumps({"query": query}) + "\n" for query in QUERIES))
+    else:
+        input_path.write_text("query\n" + "".join(f"{query}\n" for query in QUERIES))
+    output = tmp_path / "output.jsonl"
+
+    score_file(str(input_path), str(output), chunk_size=2, processes=1, artifacts_root=str(model_root))
+    lines = output.read_text().splitlines(keepends=True)
+    output.write_text("".join(lines[:3]) + lines[3][:5])  # interrupted while writing the fourth row
+
+    assert score_file(str(input_path), str(output), chunk_size=2, processes=1, artifacts_root=str(model_root)) == 4
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["id"] for row in rows] == list(range(len(QUERIES)))
+    assert rows[2]["query"] == "5"
+    assert all(len(row["results"]) == 2 for row in rows)
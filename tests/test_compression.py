@@ -0,0 +1,66 @@
+"""Tests for the encoding and scoring of `VectorCompressor`."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+from compression import VectorCompressor
+
+
+@pytest.fixture
+def matrix() -> np.ndarray:
+    """Create sentence vectors with most of their variance in a few dimensions, like trained embeddings."""
+    random_state = np.random.RandomState(0)
+    return (random_state.randn(1000, 6).dot(random_state.randn(6, 32)) + 0.05 * random_state.randn(1000, 32)).astype(
+        np.float32
+    )
+
+
+def exact_similarities(matrix: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    """Calculate the float32 cosine similarities."""
+    return matrix.dot(query_vec) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec))
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+@pytest.mark.parametrize("pca_dim", [None, 8])
+def test_save_and_load_round_trip(tmp_path: Path, matrix: np.ndarray, dtype: str, pca_dim: int) -> None:
+    compressor = VectorCompressor.fit(matrix, dtype=dtype, pca_dim=pca_dim)
+    compressor.save(tmp_path / "compression.npz")
+    loaded = VectorCompressor.load(tmp_path / "compression.npz")
+
+    codes = compressor.encode(matrix)
+    assert codes.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(loaded.encode(matrix), codes)
+    np.testing.assert_array_equal(
+        loaded.cosine_similarities(codes, matrix[0]), compressor.cosine_similarities(codes, matrix[0])
+    )
+
+
+def test_missing_file_loads_float32(tmp_path: Path, matrix: np.ndarray) -> None:
+    compressor = VectorCompressor.load(tmp_path / "compression.npz")
+
+    sims = compressor.cosine_similarities(compressor.encode(matrix), matrix[0])
+    np.testing.assert_allclose(sims, exact_similarities(matrix, matrix[0]), atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "dtype, pca_dim, atol", [("float32", None, 1e-6), ("float16", None, 1e-3), ("int8", None, 0.03), ("int8", 8, 0.05)]
+)
+@pytest.mark.parametrize("block_size", [4096, 300])
+def test_similarities_match_float32(
+    matrix: np.ndarray, dtype: str, pca_dim: int, atol: float, block_size: int
+) -> None:
+    compressor = VectorCompressor.fit(matrix, dtype=dtype, pca_dim=pca_dim)
+    compressor.block_size = block_size  # 1000 rows, so the last block of 300 is partial
+    query_vec = np.random.RandomState(1).randn(32).astype(np.float32)
+
+    sims = compressor.cosine_similarities(compressor.encode(matrix), query_vec)
+
+    np.testing.assert_allclose(sims, exact_similarities(matrix, query_vec), atol=atol)
+
+
+def test_zero_vectors_score_zero(matrix: np.ndarray) -> None:
+    compressor = VectorCompressor.fit(matrix, dtype="int8")
+    codes = compressor.encode(np.vstack([matrix[:2], np.zeros((1, 32), dtype=np.float32)]))
+
+    assert compressor.cosine_similarities(codes, matrix[0])[2] == 0
+    np.testing.assert_array_equal(compressor.cosine_similarities(codes, np.zeros(32, dtype=np.float32)), 0)
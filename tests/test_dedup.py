@@ -0,0 +1,55 @@
+"""Tests for the near-duplicate removal of `dedup`."""
+import random
+from pathlib import Path
+
+import preprocessing
+import pytest
+from dedup import choose_bands, deduplicate_file
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.9])
+def test_choose_bands_finds_pairs_at_threshold(threshold: float) -> None:
+    bands, rows = choose_bands(128, threshold)
+
+    assert bands * rows <= 128
+    assert 1 - (1 - threshold ** rows) ** bands >= 0.95
+
+
+def test_deduplicate_file_removes_near_duplicates(tmp_path: Path) -> None:
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text(
+        "python and pandas for data analysis of sales\n"
+        "python and pandas for data analysis of sales!\n"
+        "\n"
+        "computer vision with pytorch on satellite images\n"
+    )
+    output = tmp_path / "deduplicated.txt"
+
+    report = deduplicate_file(str(corpus), str(output), threshold=0.8, processes=1)
+
+    assert output.read_text().splitlines() == [
+        "python and pandas for data analysis of sales",
+        "",
+        "computer vision with pytorch on satellite images",
+    ]
+    assert (report.lines_in, report.lines_out, report.removed) == (4, 3, 1)
+
+
+@pytest.mark.parametrize("dedup_threshold", [None, 0.8])
+def test_append_to_corpus_keeps_the_boosting(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, dedup_threshold: float
+) -> None:
+    (tmp_path / "corpus").mkdir()
+    rng = random.Random(0)
+    words = "parse json python pandas merge join docker kubernetes deploy aws lambda regex list dict sort".split()
+    scraped = [" ".join(rng.choice(words) for _ in range(8)) for _ in range(50)] * 2
+    (tmp_path / "corpus" / "corpus-without-radix-data.txt").write_text("".join(line + "\n" for line in scraped))
+    monkeypatch.setattr(preprocessing, "__file__", str(tmp_path / "preprocessing.py"))
+    monkeypatch.setattr(preprocessing, "make_clean_corpus_file", lambda corpus_path: None)
+
+    preprocessing.append_to_corpus([["radix project one"], ["radix project two"]], 0.1, dedup_threshold)
+
+    merged = (tmp_path / "corpus" / "corpus-merged.txt").read_text().splitlines()
+    boosted = [line for line in merged if "radix" in line]
+    assert len(boosted) == 10
+    assert len(merged) - len(boosted) == (100 if dedup_threshold is None else len(set(scraped)))
@@ -0,0 +1,205 @@
+"""Tests for the single-project changes of `ProjectIndex`."""
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+
+import artifacts
+import numpy as np
+import pytest
+from index import ProjectIndex
+
+HEADER = ["Technologies", "Client"]
+
+
+def embed(sentence: str) -> np.ndarray:
+    """Return a deterministic vector per sentence."""
+    return np.random.RandomState(zlib.crc32(sentence.encode())).randn(8).astype(np.float32)
+
+
+def publish_catalog(root: Path, labelled_text: dict, embeddings: bytes = b"") -> str:
+    """Publish a version with the given projects and a dummy embeddings file."""
+    staging = root.parent / "staging"
+    staging.mkdir(exist_ok=True)
+    (staging / "embeddings.bin").write_bytes(embeddings)
+    (staging / "labelled-text.json").write_text(json.dumps(labelled_text))
+    metadata = {"header": HEADER, **{name: ["python", name] for name in labelled_text}}
+    (staging / "metadata.json").write_text(json.dumps(metadata))
+    (staging / "project_names.txt").write_text("".join(name + "\n" for name in labelled_text))
+    return artifacts.publish(
+        embeddings_path=str(staging / "embeddings.bin"),
+        labelled_text_path=str(staging / "labelled-text.json"),
+        metadata_path=str(staging / "metadata.json"),
+        project_names_path=str(staging / "project_names.txt"),
+        root=root,
+    )
+
+
+def load_index(root: Path, compact_threshold: int = 100) -> ProjectIndex:
+    """Load the index of the current version."""
+    paths = artifacts.resolve_paths(artifacts.get_current_version(root), root)
+    return ProjectIndex(embed, paths, artifacts_root=root, compact_threshold=compact_threshold)
+
+
+@pytest.fixture
+def root(tmp_path: Path) -> Path:
+    """Create an artifacts directory with the projects A and B."""
+    root = tmp_path / "artifacts"
+    publish_catalog(root, {"A": ["a one", "a two"], "B": ["b one"]})
+    return root
+
+
+def test_upsert_adds_project(root: Path) -> None:
+    index = load_index(root)
+    index.upsert_project("C", ["c one", "c two"], ["aws", "C"])
+
+    assert index.project_names == ["A", "B", "C"]
+    assert index.metadata["C"] == ["aws", "C"]
+    scores = dict(index.score(embed("c one")))
+    assert max(scores, key=scores.get) == "C"
+
+
+def test_zero_query_scores_zero(root: Path) -> None:
+    index = load_index(root)
+
+    assert index.score(np.zeros(8, dtype=np.float32)) == [("A", 0.0), ("B", 0.0)]
+
+
+def test_upsert_new_project_requires_metadata(root: Path) -> None:
+    index = load_index(root)
+    with pytest.raises(ValueError):
+        index.upsert_project("C", ["c one"])
+
+
+def test_upsert_existing_project_keeps_metadata(root: Path) -> None:
+    index = load_index(root)
+    index.upsert_project("A", ["a three"])
+
+    assert index.labelled_text["A"] == ["a three"]
+    assert index.metadata["A"] == ["python", "A"]
+
+
+def test_remove_project(root: Path) -> None:
+    index = load_index(root)
+    index.remove_project("B")
+
+    assert index.project_names == ["A"]
+    assert "B" not in index.metadata
+    assert [name for name, _ in index.score(embed("b one"))] == ["A"]
+    with pytest.raises(KeyError):
+        index.remove_project("B")
+
+
+def test_changes_are_replayed_by_another_index(root: Path) -> None:
+    index = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+    index.remove_project("B")
+
+    other = load_index(root)
+    assert other.labelled_text == index.labelled_text
+    assert other.metadata == index.metadata
+    assert other.project_names == ["A", "C"]
+
+    index.upsert_project("D", ["d one"], ["gcp", "D"])
+    other.refresh()
+    assert other.project_names == ["A", "C", "D"]
+
+
+def test_published_version_is_not_modified(root: Path) -> None:
+    version = artifacts.get_current_version(root)
+    before = {path.name: path.read_bytes() for path in (root / version).iterdir()}
+
+    index = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+    index.remove_project("B")
+
+    assert {path.name: path.read_bytes() for path in (root / version).iterdir()} == before
+
+
+def test_changes_survive_a_new_version(root: Path) -> None:
+    index = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+    index.remove_project("B")
+
+    publish_catalog(root, {"A": ["a one", "a two"], "B": ["b one"]})
+    assert load_index(root).project_names == ["A", "C"]
+
+
+def test_half_written_entry_is_skipped(root: Path) -> None:
+    index = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+    entry = json.dumps({"op": "remove", "name": "A"}) + "\n"
+    with open(artifacts.index_log_path(root), "a") as file:
+        file.write(entry[:10])
+
+    other = load_index(root)
+    assert other.project_names == ["A", "B", "C"]
+
+    with open(artifacts.index_log_path(root), "a") as file:
+        file.write(entry[10:])
+    other.refresh()
+    assert other.project_names == ["B", "C"]
+
+
+def test_compaction_publishes_a_new_version(root: Path) -> None:
+    old_version = artifacts.get_current_version(root)
+    index = load_index(root)
+    other = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+    index.remove_project("B")
+
+    new_version = index.compact()
+
+    assert new_version is not None and new_version != old_version
+    assert artifacts.get_current_version(root) == new_version
+    assert artifacts.index_log_path(root).read_text() == ""
+    assert json.loads((root / old_version / "labelled-text.json").read_text()).keys() == {"A", "B"}
+    assert json.loads((root / new_version / "labelled-text.json").read_text()).keys() == {"A", "C"}
+
+    index.upsert_project("D", ["d one"], ["gcp", "D"])
+    assert load_index(root).project_names == ["A", "C", "D"]
+    other.refresh()
+    assert other.project_names == ["A", "C", "D"]
+
+
+def test_compaction_runs_in_the_background(root: Path) -> None:
+    index = load_index(root, compact_threshold=2)
+    version = artifacts.get_current_version(root)
+    for i in range(3):
+        index.upsert_project(f"P{i}", [f"p {i}"], ["aws", str(i)])
+
+    deadline = time.time() + 10
+    while artifacts.get_current_version(root) == version and time.time() < deadline:
+        time.sleep(0.01)
+    with index._compact_lock:  # wait for the log to be trimmed
+        pass
+    assert artifacts.get_current_version(root) != version
+    assert load_index(root).project_names == index.project_names
+
+
+def test_compaction_shares_the_embeddings(root: Path) -> None:
+    old_version = artifacts.get_current_version(root)
+    index = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+
+    new_version = index.compact()
+
+    embeddings_file = artifacts.EMBEDDINGS_FILE
+    assert os.path.samefile(root / old_version / embeddings_file, root / new_version / embeddings_file)
+
+
+def test_compaction_folds_into_a_newer_version(root: Path) -> None:
+    index = load_index(root)
+    index.upsert_project("C", ["c one"], ["aws", "C"])
+    retrained = publish_catalog(root, {"A": ["a one"], "NEW": ["new one"]}, embeddings=b"retrained")
+
+    new_version = index.compact()
+
+    assert json.loads((root / new_version / "labelled-text.json").read_text()) == {
+        "A": ["a one"],
+        "NEW": ["new one"],
+        "C": ["c one"],
+    }
+    embeddings_file = artifacts.EMBEDDINGS_FILE
+    assert os.path.samefile(root / retrained / embeddings_file, root / new_version / embeddings_file)
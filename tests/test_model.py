@@ -0,0 +1,62 @@
+"""Tests for loading and reloading the artifact versions in `Model`."""
+from pathlib import Path
+
+import pytest
+from conftest import publish_catalog
+
+pytest.importorskip("fasttext")
+
+from model import Model  # noqa: E402  (needs fasttext)
+
+
+def test_reload_of_a_compacted_version_keeps_the_embeddings(model_root: Path) -> None:
+    model = Model(artifacts_root=str(model_root), watch_interval=None)
+    embeddings = model.embeddings
+    model.index.upsert_project("C", ["pytorch vision model"], ["pytorch", "C"])
+
+    version = model.index.compact()
+
+    assert model.reload() is True
+    assert model.version == version
+    assert model.embeddings is embeddings
+    assert model.project_names == ["A", "B", "C"]
+
+
+def test_reload_swaps_in_a_published_version(model_root: Path, embeddings_path: Path) -> None:
+    model = Model(artifacts_root=str(model_root), watch_interval=None)
+    old_version = model.version
+    assert model.reload() is False
+
+    version = publish_catalog(model_root, embeddings_path, {"A": ["aws deployment ec2"], "C": ["pytorch vision"]})
+
+    assert model.reload() is True
+    assert model.version == version != old_version
+    assert model.project_names == ["A", "C"]
+    assert [name for name, _ in model.get_best_project_scores("pytorch vision", 2)] == ["C", "A"]
+
+
+def test_failed_reload_keeps_the_old_state(model_root: Path, tmp_path: Path) -> None:
+    model = Model(artifacts_root=str(model_root), watch_interval=None)
+    old_version = model.version
+    broken = tmp_path / "broken.bin"
+    broken.write_bytes(b"not a fasttext model")
+    publish_catalog(model_root, broken, {"C": ["pytorch vision"]})
+
+    with pytest.raises(Exception):
+        model.reload()
+
+    assert model.version == old_version
+    assert model.project_names == ["A", "B"]
+    assert len(model.get_best_project_scores("aws", 2)) == 2
+
+
+def test_metadata_of_projects_removed_after_scoring_is_skipped(model_root: Path, embeddings_path: Path) -> None:
+    model = Model(artifacts_root=str(model_root), watch_interval=None)
+    names = [name for name, _ in model.get_best_project_scores("aws", 2)]
+    publish_catalog(model_root, embeddings_path, {"A": ["aws deployment ec2"]})
+    model.reload()
+
+    df = model.get_metadata_df(names)
+
+    assert df["Project name"].tolist() == ["A"]
+    assert model.get_metadata_df(["B"])["Project name"].tolist() == []
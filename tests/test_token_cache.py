@@ -0,0 +1,51 @@
+"""Tests for `TokenVectorCache` against the sentence vectors of fasttext."""
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+from token_cache import TokenVectorCache
+
+fasttext = pytest.importorskip("fasttext")
+
+WORDS = "aws nlp forecasting classification sentiment analysis pytorch vision deployment ec2 model data".split()
+
+
+@pytest.fixture(scope="module")
+def embeddings(tmp_path_factory: pytest.TempPathFactory) -> object:
+    """Train a small unsupervised model."""
+    rng = random.Random(0)
+    corpus = Path(tmp_path_factory.mktemp("corpus")) / "corpus.txt"
+    corpus.write_text("".join(" ".join(rng.choice(WORDS) for _ in range(10)) + "\n" for _ in range(2000)))
+    return fasttext.train_unsupervised(str(corpus), dim=16, epoch=1, minCount=1, thread=1, verbose=0)
+
+
+@pytest.mark.parametrize(
+    "sentence",
+    [
+        "aws nlp forecasting",
+        "classification, sentiment analysis of unseenword",
+        "  spaces\tand\ttabs   aws ",
+        "",
+        "aws aws aws nlp",
+    ],
+)
+def test_sentence_vector_matches_fasttext(embeddings: object, sentence: str) -> None:
+    cache = TokenVectorCache(embeddings)
+    expected = embeddings.get_sentence_vector(sentence)
+    np.testing.assert_allclose(cache.get_sentence_vector(sentence), expected, rtol=1e-5, atol=1e-7)
+    np.testing.assert_allclose(cache.get_sentence_vector(sentence), expected, rtol=1e-5, atol=1e-7)
+
+
+def test_newline_is_rejected(embeddings: object) -> None:
+    with pytest.raises(ValueError):
+        TokenVectorCache(embeddings).get_sentence_vector("aws\nnlp")
+
+
+def test_stats_and_size_bound(embeddings: object) -> None:
+    cache = TokenVectorCache(embeddings, max_size=2)
+    cache.get_sentence_vector("aws nlp aws")
+    assert cache.get_stats() == {"hits": 1, "misses": 2, "size": 2, "hit_rate": 1 / 3}
+
+    cache.get_sentence_vector("forecasting")
+    assert cache.get_stats()["size"] == 2